@@ -4,6 +4,7 @@ Detect salary transactions from bank statement JSON.
 Supports Thai payroll with progressive tax calculation.
 """
 
+import heapq
 import json
 import re
 from collections import defaultdict, Counter
@@ -11,7 +12,6 @@ from statistics import mean, pstdev
 from dataclasses import dataclass, asdict
 from typing import List, Optional, Tuple, Dict, Any
 from pathlib import Path
-import pandas as pd
 
 KEYWORD_PATTERNS = [
     r"เงินเดือน/อื่นๆ", r"\(BSD02\)", r"Payroll", r"เงินเดือน"
@@ -21,6 +21,14 @@ EXCLUDE_PATTERNS = [
 ]
 CREDIT_HINTS = ["เงินโอนเข้า", "เงินเดือน/อื่นๆ", "(BSD02)", "BSD02"]
 
+# Compiled once at import, used per line / per transaction
+AMOUNT_RE = re.compile(r"(\d{1,3}(?:,\d{3})*\.\d{2})")
+TIME_RE = re.compile(r"\b([01]?\d|2[0-3]):[0-5]\d\b")
+CHANNEL_RE = re.compile(r"\(([A-Z0-9]{4,6})\)")
+KEYWORD_RE = re.compile("|".join(KEYWORD_PATTERNS))
+EXCLUDE_RE = re.compile("|".join(EXCLUDE_PATTERNS), flags=re.I)
+CREDIT_HINT_RE = re.compile("|".join(map(re.escape, CREDIT_HINTS)))
+
 @dataclass
 class Tx:
     page: int
@@ -36,23 +44,28 @@ class Tx:
 
 def _find_amount(s: str) -> Optional[float]:
     """Extract amount from text (handles Thai number formatting)."""
-    m = re.search(r"(\d{1,3}(?:,\d{3})*\.\d{2})", s)
+    m = AMOUNT_RE.search(s)
     if not m: 
         return None
-    try:
-        return float(m.group(1).replace(",", ""))
-    except:
-        return None
+    # AMOUNT_RE only matches digits, commas and a 2-digit fraction, float() cannot fail
+    return float(m.group(1).replace(",", ""))
 
 def extract_transactions(statement_json: Dict[str, Any], 
                         employer_aliases: Optional[List[str]] = None) -> List[Tx]:
     """Extract all transactions from statement JSON."""
     txs: List[Tx] = []
+    # upper-cased once per call instead of once per alias per line
+    aliases_upper = [(alias, alias.upper()) for alias in employer_aliases or []]
     for page_obj in statement_json.get("pages", []):
         page_no = page_obj.get("page_number", 0)
         text = page_obj.get("text", "") or ""
-        lines = [l.strip() for l in text.splitlines() if l.strip()]
+        lines = [s for l in text.splitlines() if (s := l.strip())]
+        # first line with the deposit header, found once per page
+        deposit_line = next((j for j, l in enumerate(lines) if "รายการฝาก" in l), None)
         for i, line in enumerate(lines):
+            # every amount has a decimal point, skip the regex on lines without one
+            if "." not in line:
+                continue
             amt = _find_amount(line)
             if amt is None:
                 continue
@@ -64,25 +77,26 @@ def extract_transactions(statement_json: Dict[str, Any],
             window = " ".join(window_lines)
 
             # direction heuristic
-            is_credit = any(h in window for h in CREDIT_HINTS)
-            if not is_credit:
-                if "รายการฝาก" in "\n".join(lines[:max(40, i+1)]) or "เงินโอนเข้า" in window:
+            is_credit = CREDIT_HINT_RE.search(window) is not None
+            if not is_credit and deposit_line is not None:
+                # header within the first max(40, i+1) lines of the page
+                if deposit_line < max(40, i+1):
                     is_credit = True
 
             # time
-            m_time = re.search(r"\b([01]?\d|2[0-3]):[0-5]\d\b", window)
+            m_time = TIME_RE.search(window)
             time_str = m_time.group(0) if m_time else None
 
             # channel code (e.g., BSD02, IORSDT, MORISW, etc.)
-            m_channel = re.search(r"\(([A-Z0-9]{4,6})\)", window)
+            m_channel = CHANNEL_RE.search(window)
             channel = m_channel.group(1) if m_channel else None
 
             # payer detection (simple alias match)
             payer = None
-            if employer_aliases:
+            if aliases_upper:
                 up = window.upper()
-                for alias in employer_aliases:
-                    if alias.upper() in up:
+                for alias, alias_up in aliases_upper:
+                    if alias_up in up:
                         payer = alias
                         break
 
@@ -100,11 +114,11 @@ def extract_transactions(statement_json: Dict[str, Any],
 
 def is_excluded(tx: Tx) -> bool:
     """Check if transaction should be excluded."""
-    return re.search("|".join(EXCLUDE_PATTERNS), tx.desc_raw, flags=re.I) is not None
+    return EXCLUDE_RE.search(tx.desc_raw) is not None
 
 def has_keyword(tx: Tx) -> bool:
     """Check if transaction has salary keywords."""
-    return re.search("|".join(KEYWORD_PATTERNS), tx.desc_raw) is not None
+    return KEYWORD_RE.search(tx.desc_raw) is not None
 
 def time_score(tx: Tx) -> int:
     """Score based on time (early morning = likely payroll)."""
@@ -120,16 +134,19 @@ def time_score(tx: Tx) -> int:
 def cluster_amounts(candidates: List[Tx], pct: float = 0.03) -> List[List[Tx]]:
     """Group similar amounts into clusters."""
     clusters: List[List[Tx]] = []
+    totals: List[float] = []  # running sum of amounts per cluster
     for tx in sorted(candidates, key=lambda x: x.amount):
         placed = False
-        for c in clusters:
-            center = mean([t.amount for t in c])
+        for k, c in enumerate(clusters):
+            center = totals[k] / len(c)
             if abs(tx.amount - center) <= pct * center:
                 c.append(tx)
+                totals[k] += tx.amount
                 placed = True
                 break
         if not placed:
             clusters.append([tx])
+            totals.append(tx.amount)
     return clusters
 
 def thai_monthly_net_from_gross(
@@ -286,7 +303,8 @@ def pick_salary(scored: List[Tx]) -> Dict[str, Any]:
     best_group = sorted(by_cluster[best_cid], key=lambda x: -x.score) if best_cid is not None else []
     best_amount = round(sum(t.amount for t in best_group)/len(best_group), 2) if best_group else None
 
-    top10 = sorted(scored, key=lambda x: -x.score)[:10]
+    # only the first 10 are kept, select them without sorting everything
+    top10 = heapq.nlargest(10, scored, key=lambda x: x.score)
     return {
         "salary_candidates": [asdict_tx(t) for t in top10],
         "best_guess_group": [asdict_tx(t) for t in best_group],
@@ -332,6 +350,26 @@ def run(statement_path: str,
     with open(statement_path, "r", encoding="utf-8") as f:
         statement_json = json.load(f)
 
+    return analyze_statement(
+        statement_json,
+        export_prefix or str(Path(statement_path).with_suffix("")),
+        employer_aliases=employer_aliases,
+        gross=gross, net=net,
+        pvd_rate=pvd_rate,
+        eff_tax_rate=eff_tax_rate
+    )
+
+def analyze_statement(statement_json: Dict[str, Any],
+                      export_prefix: str,
+                      employer_aliases: Optional[List[str]] = None,
+                      gross: Optional[float] = None,
+                      net: Optional[float] = None,
+                      pvd_rate: Optional[float] = None,
+                      eff_tax_rate: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run salary detection on already-loaded statement data and write exports.
+    Same arguments and return value as run(), export_prefix is required.
+    """
     txs = extract_transactions(statement_json, employer_aliases=employer_aliases)
 
     # Keep only credits and non-excluded
@@ -345,8 +383,10 @@ def run(statement_path: str,
     )
     result = pick_salary(scored)
 
-    # Exports
-    prefix = export_prefix or str(Path(statement_path).with_suffix(""))
+    # Exports (pandas is imported here, it is only needed for writing files
+    # and is the slowest import of the pipeline)
+    import pandas as pd
+    prefix = export_prefix
     df_all = pd.DataFrame([asdict_tx(t) for t in scored]).sort_values("score", ascending=False)
     df_best = pd.DataFrame(result["best_guess_group"]) if result["best_guess_group"] else pd.DataFrame()
     df_top10 = pd.DataFrame(result["salary_candidates"]) if result["salary_candidates"] else pd.DataFrame()
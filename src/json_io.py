@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+JSON read/write helpers shared by the pipeline scripts.
+Uses orjson when it is installed, otherwise the stdlib json module.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional - fall back to the stdlib encoder
+    orjson = None
+
+
+def dumps_json(obj: Any) -> bytes:
+    """Serialize to indented UTF-8 JSON (same bytes as json.dumps indent=2)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def loads_json(raw: bytes) -> Any:
+    """Parse UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
@@ -4,11 +4,42 @@ Mask sensitive data before sending to external API (GPT, Gemini, etc.)
 To comply with PDPA (Personal Data Protection Act)
 """
 
-import json
 import re
 import sys
+from pathlib import Path
 from typing import Dict, Any
 
+from json_io import dumps_json, loads_json
+
+
+# (token prefix, pattern) in priority order, compiled once at import
+_MASK_PATTERNS = [
+    # 1. Thai ID (13 digits)
+    ('THAIID', r'\b\d{13}\b'),
+    # 2. Account numbers (xxx-x-xxxxx-x format)
+    ('ACCOUNT', r'\b\d{3,4}-\d+-\d{5,7}-?\d?\b'),
+    # 3. Thai names (นาย, นางสาว, นาง + Thai characters)
+    ('NAME', r'(?:นาย|นางสาว|นาง)\s+[ก-๙]+\s+[ก-๙]+'),
+    # 4. Phone numbers (0xx-xxx-xxxx or 0xxxxxxxxx)
+    ('PHONE', r'\b0\d{2}-\d{3}-\d{4}\b|\b0\d{9}\b'),
+    # 5. Addresses (keep general area only)
+    ('ADDRESS', r'\d+/\d+[^\n]+'),
+    # 6. Email addresses
+    ('EMAIL', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'),
+]
+
+# All patterns fused into one alternation, the group name is the token prefix.
+# At the same position earlier groups win.
+_MASK_RE = re.compile('|'.join(
+    f'(?P<{name}>{pattern})' for name, pattern in _MASK_PATTERNS
+))
+
+# An address runs to the end of the line and can swallow an ID, name, phone or
+# email. Those are registered on their own too, so their other copies get masked.
+_ADDRESS_PII_RE = re.compile('|'.join(
+    f'(?P<{name}>{pattern})' for name, pattern in _MASK_PATTERNS if name != 'ADDRESS'
+))
+
 
 def mask_personal_data(text: str) -> tuple[str, Dict[str, str]]:
     """
@@ -16,99 +47,93 @@ def mask_personal_data(text: str) -> tuple[str, Dict[str, str]]:
     Returns: (masked_text, mapping_dict)
     """
     mapping = {}
-    masked_text = text
-    
-    # 1. Mask Thai ID (13 digits)
-    thai_id_pattern = r'\b\d{13}\b'
-    for match in re.finditer(thai_id_pattern, masked_text):
-        original = match.group(0)
-        masked = f"THAIID_{len(mapping)+1:03d}"
-        mapping[masked] = original
-        masked_text = masked_text.replace(original, masked)
-    
-    # 2. Mask account numbers (xxx-x-xxxxx-x format)
-    account_pattern = r'\b\d{3,4}-\d+-\d{5,7}-?\d?\b'
-    for match in re.finditer(account_pattern, masked_text):
-        original = match.group(0)
-        masked = f"ACCOUNT_{len(mapping)+1:03d}"
-        mapping[masked] = original
-        masked_text = masked_text.replace(original, masked)
-    
-    # 3. Mask Thai names (นาย, นาง, นางสาว + Thai characters)
-    name_patterns = [
-        r'นาย\s+[ก-๙]+\s+[ก-๙]+',
-        r'นาง\s+[ก-๙]+\s+[ก-๙]+',
-        r'นางสาว\s+[ก-๙]+\s+[ก-๙]+'
-    ]
-    for pattern in name_patterns:
-        for match in re.finditer(pattern, masked_text):
-            original = match.group(0)
-            if original not in mapping.values():
-                masked = f"NAME_{len(mapping)+1:03d}"
-                mapping[masked] = original
-                masked_text = masked_text.replace(original, masked)
-    
-    # 4. Mask phone numbers (0xx-xxx-xxxx or 0xxxxxxxxx)
-    phone_patterns = [
-        r'\b0\d{2}-\d{3}-\d{4}\b',
-        r'\b0\d{9}\b'
-    ]
-    for pattern in phone_patterns:
-        for match in re.finditer(pattern, masked_text):
-            original = match.group(0)
-            masked = f"PHONE_{len(mapping)+1:03d}"
-            mapping[masked] = original
-            masked_text = masked_text.replace(original, masked)
-    
-    # 5. Mask addresses (keep general area only)
-    address_pattern = r'\d+/\d+[^\n]+'
-    for match in re.finditer(address_pattern, masked_text):
-        original = match.group(0)
-        masked = f"ADDRESS_{len(mapping)+1:03d}"
-        mapping[masked] = original
-        masked_text = masked_text.replace(original, masked)
-    
-    # 6. Mask email addresses
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    for match in re.finditer(email_pattern, masked_text):
-        original = match.group(0)
-        masked = f"EMAIL_{len(mapping)+1:03d}"
-        mapping[masked] = original
-        masked_text = masked_text.replace(original, masked)
-    
+    tokens = {}  # original -> token, a repeated value keeps its first token
+    
+    def register(prefix, original):
+        token = tokens.get(original)
+        if token is None:
+            token = '%s_%03d' % (prefix, len(mapping) + 1)
+            mapping[token] = original
+            tokens[original] = token
+        return token
+    
+    def replace(match):
+        if match.lastgroup == 'ADDRESS':
+            for sub in _ADDRESS_PII_RE.finditer(match.group(0)):
+                register(sub.lastgroup, sub.group(0))
+        return register(match.lastgroup, match.group(0))
+    
+    # One scan over the text, each match is substituted as it is found
+    masked_text = _MASK_RE.sub(replace, text)
+
+    # Mask every other copy of a found value too - e.g. an ID glued to Thai
+    # text ("บัตรประชาชน1234567890123"), where \b does not match
+    masked_text = _replace_tokens(masked_text, tokens)
+
     return masked_text, mapping
 
 
-def mask_json_file(input_file: str, output_file: str = None):
-    """Mask sensitive data in JSON file"""
-    
-    # Read original JSON
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
+def _replace_tokens(text: str, replacements: Dict[str, str]) -> str:
+    """Replace every key of replacements found in text, in a single pass"""
+    if not replacements:
+        return text
+    # Longest first so NAME_1000 is not matched as NAME_100 + "0"
+    keys = sorted(replacements, key=len, reverse=True)
+    pattern = re.compile('|'.join(map(re.escape, keys)))
+    return pattern.sub(lambda m: replacements[m.group(0)], text)
+
+
+def _merge_page_mapping(masked_text: str, mapping: Dict[str, str],
+                        all_mappings: Dict[str, str],
+                        seen: Dict[str, str]) -> str:
+    """
+    Re-key a page mapping into all_mappings with globally unique tokens
+    seen maps original -> global token, a value repeated on a later page
+    reuses the token it got on the first page
+    Returns: masked_text using the new tokens
+    """
+    renamed = {}
+    for token, original in mapping.items():
+        new_token = seen.get(original)
+        if new_token is None:
+            prefix = token.rsplit('_', 1)[0]
+            new_token = '%s_%03d' % (prefix, len(all_mappings) + 1)
+            all_mappings[new_token] = original
+            seen[original] = new_token
+        renamed[token] = new_token
+
+    return _replace_tokens(masked_text, renamed)
+
+
+def mask_statement(data: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Mask every page of extracted statement data (as returned by pdf_to_json)
+    Returns: (masked_data, mapping_dict) - the input dict is left unchanged
+    """
+    # Every page numbers its tokens from 001, renumber them across the file
     all_mappings = {}
-    
-    # Mask each page
+    seen = {}
+    masked_pages = []
     for page in data['pages']:
         masked_text, mapping = mask_personal_data(page['text'])
-        page['text'] = masked_text
-        all_mappings.update(mapping)
+        masked_text = _merge_page_mapping(masked_text, mapping, all_mappings, seen)
+        masked_pages.append({**page, 'text': masked_text})
     
-    # Save masked JSON
-    if output_file is None:
-        output_file = input_file.replace('_extracted.json', '_masked.json')
+    return {**data, 'pages': masked_pages}, all_mappings
+
+
+def save_masked_json(masked_data: Dict[str, Any], mapping: Dict[str, str], output_file: str):
+    """Save masked data and its mapping file"""
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    Path(output_file).write_bytes(dumps_json(masked_data))
     
     # Save mapping (for internal use only - DO NOT send to API)
     mapping_file = output_file.replace('.json', '_mapping.json')
-    with open(mapping_file, 'w', encoding='utf-8') as f:
-        json.dump(all_mappings, f, ensure_ascii=False, indent=2)
+    Path(mapping_file).write_bytes(dumps_json(mapping))
     
     print(f"✅ Masked data บันทึกที่: {output_file}")
     print(f"🔑 Mapping บันทึกที่: {mapping_file}")
-    print(f"📊 จำนวนข้อมูลที่ mask: {len(all_mappings)} รายการ")
+    print(f"📊 จำนวนข้อมูลที่ mask: {len(mapping)} รายการ")
     print("\n⚠️  คำเตือน:")
     print("   - ส่งเฉพาะไฟล์ *_masked.json ไปยัง API เท่านั้น")
     print("   - ไฟล์ *_mapping.json เก็บไว้ที่เครื่องตัวเองเท่านั้น!")
@@ -116,17 +141,27 @@ def mask_json_file(input_file: str, output_file: str = None):
     return output_file, mapping_file
 
 
+def mask_json_file(input_file: str, output_file: str = None):
+    """Mask sensitive data in JSON file"""
+    
+    # Read original JSON
+    data = loads_json(Path(input_file).read_bytes())
+    
+    masked_data, all_mappings = mask_statement(data)
+    
+    # Save masked JSON
+    if output_file is None:
+        output_file = input_file.replace('_extracted.json', '_masked.json')
+    
+    return save_masked_json(masked_data, all_mappings, output_file)
+
+
 def unmask_response(response_text: str, mapping_file: str) -> str:
     """Unmask the API response using mapping"""
     
-    with open(mapping_file, 'r', encoding='utf-8') as f:
-        mapping = json.load(f)
-    
-    unmasked_text = response_text
-    for masked, original in mapping.items():
-        unmasked_text = unmasked_text.replace(masked, original)
+    mapping = loads_json(Path(mapping_file).read_bytes())
     
-    return unmasked_text
+    return _replace_tokens(response_text, mapping)
 
 
 if __name__ == '__main__':
@@ -8,58 +8,32 @@ Usage:
 """
 
 import sys
-import os
 import json
-import subprocess
 import argparse
+import traceback
 from pathlib import Path
 
+from json_io import loads_json
+from simple_pdf_to_json import pdf_to_json
+from mask_data import mask_statement, save_masked_json
+from analyze_salary import analyze_statement
 
-def run_command(cmd, description):
-    """Execute a command and handle errors."""
+
+def run_step(description, func, *args, **kwargs):
+    """Run a pipeline step in-process and handle errors."""
     print(f"\n{'='*70}")
     print(f"▶ {description}")
     print(f"{'='*70}")
-    print(f"Running: {' '.join(cmd)}")
-    
-    result = subprocess.run(cmd, cwd=os.getcwd())
     
-    if result.returncode != 0:
-        print(f"\n❌ Error: {description} failed with exit code {result.returncode}")
-        return False
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        print(f"\n❌ Error: {description} failed: {e}")
+        traceback.print_exc()
+        return None
     
     print(f"✓ {description} completed successfully")
-    return True
-
-
-def extract_output_filename(pdf_filename):
-    """Find the extracted JSON filename from PDF name."""
-    pdf_name = Path(pdf_filename).stem  # Get filename without extension
-    
-    # Check for _extracted.json variant (what simple_pdf_to_json.py creates)
-    json_dir = Path("data/json")
-    
-    # Try direct match first
-    expected_names = [
-        f"data/json/{pdf_name}_extracted.json",
-        f"data/json/{pdf_name}.json"
-    ]
-    
-    for expected_path in expected_names:
-        if Path(expected_path).exists():
-            return expected_path
-    
-    # Fallback: Find the most recent _extracted.json file in data/json/
-    if json_dir.exists():
-        extracted_files = sorted(
-            json_dir.glob("*_extracted.json"),
-            key=lambda x: x.stat().st_mtime,
-            reverse=True
-        )
-        if extracted_files:
-            return str(extracted_files[0])
-    
-    return None
+    return result
 
 
 def main():
@@ -103,77 +77,60 @@ def main():
         json_filename = args.input_file
         print(f"✓ Step 1/3: PDF Extraction - SKIPPED (input is already JSON)")
         print(f"   Using JSON: {json_filename}\n")
-    else:
-        # Get the directory where this script is located
-        script_dir = Path(__file__).parent
         
-        extract_cmd = [
-            sys.executable,
-            str(script_dir / "simple_pdf_to_json.py"),
-            args.input_file
-        ]
-        if args.password:
-            extract_cmd.extend(["--password", args.password])
-        
-        if not run_command(extract_cmd, "Step 1/3: PDF Extraction"):
-            sys.exit(1)
+        extracted = loads_json(Path(json_filename).read_bytes())
+    else:
+        json_filename = f"data/json/{input_path.stem}_extracted.json"
         
-        # Find the extracted JSON file
-        json_filename = extract_output_filename(args.input_file)
-        if not json_filename:
-            print("❌ Error: Could not find extracted JSON file")
+        extracted = run_step(
+            "Step 1/3: PDF Extraction",
+            pdf_to_json, args.input_file, json_filename, args.password or None
+        )
+        if extracted is None:
             sys.exit(1)
         
         print(f"   Extracted JSON: {json_filename}")
     
-    # Step 2: Mask sensitive data
-    script_dir = Path(__file__).parent
-    mask_cmd = [
-        sys.executable,
-        str(script_dir / "mask_data.py"),
-        json_filename
-    ]
-    
-    if not run_command(mask_cmd, "Step 2/3: Data Masking (PDPA Compliance)"):
-        sys.exit(1)
-    
     # Construct masked filename
     if "_extracted.json" in json_filename:
-        # If input was _extracted.json, mask_data.py will create _masked.json by replacing _extracted
         masked_filename = json_filename.replace("_extracted.json", "_masked.json")
     elif json_filename.endswith(".json"):
-        # If input is just .json, mask_data.py will append _masked
         masked_filename = json_filename.replace(".json", "_masked.json")
     else:
         masked_filename = f"{json_filename}_masked.json"
     
-    print(f"   Masked JSON: {masked_filename}")
+    # Step 2: Mask sensitive data (stages hand data over in memory, the files
+    # are still written for ask_claude.py and unmasking)
+    masked = run_step(
+        "Step 2/3: Data Masking (PDPA Compliance)",
+        mask_statement, extracted
+    )
+    if masked is None:
+        sys.exit(1)
     
-    # Step 3: Analyze salary
-    script_dir = Path(__file__).parent
-    analyze_cmd = [
-        sys.executable,
-        str(script_dir / "analyze_salary.py"),
-        masked_filename,
-        "--employer", args.employer
-    ]
+    masked_data, mapping = masked
+    _, mapping_filename = save_masked_json(masked_data, mapping, masked_filename)
     
-    if args.gross:
-        analyze_cmd.extend(["--gross", str(args.gross)])
-    if args.net:
-        analyze_cmd.extend(["--net", str(args.net)])
-    if args.pvd:
-        analyze_cmd.extend(["--pvd", str(args.pvd)])
-    if args.eff_tax:
-        analyze_cmd.extend(["--eff_tax", str(args.eff_tax)])
-    if args.out_prefix:
-        analyze_cmd.extend(["--out-prefix", args.out_prefix])
+    print(f"   Masked JSON: {masked_filename}")
     
-    if not run_command(analyze_cmd, "Step 3/3: Salary Analysis & Detection"):
+    # Step 3: Analyze salary
+    analysis = run_step(
+        "Step 3/3: Salary Analysis & Detection",
+        analyze_statement,
+        masked_data,
+        args.out_prefix or str(Path(masked_filename).with_suffix("")),
+        employer_aliases=[args.employer] if args.employer else None,
+        gross=args.gross or None,
+        net=args.net or None,
+        pvd_rate=args.pvd or None,
+        eff_tax_rate=args.eff_tax or None
+    )
+    if analysis is None:
         sys.exit(1)
     
-    # Extract base filename for summary
-    base_name = Path(masked_filename).stem.replace("_masked", "")
+    print(json.dumps(analysis["summary"], ensure_ascii=False, indent=2))
+    
+    exports = analysis["exports"]
     
     print(f"\n{'='*70}")
     print(f"✓ Processing Complete!")
@@ -181,10 +138,10 @@ def main():
     print(f"Output files:")
     print(f"  • Extracted JSON:     {json_filename}")
     print(f"  • Masked JSON:        {masked_filename}")
-    print(f"  • Mapping file:       {masked_filename.replace('.json', '_mapping.json')}")
-    print(f"  • Salary analysis:    {base_name}_salary_detection.xlsx")
-    print(f"  • Scored transactions: {base_name}_scored.csv")
-    print(f"  • Summary JSON:       {base_name}_summary.json")
+    print(f"  • Mapping file:       {mapping_filename}")
+    print(f"  • Salary analysis:    {exports['xlsx']}")
+    print(f"  • Scored transactions: {exports['csv']}")
+    print(f"  • Summary JSON:       {exports['json']}")
     print(f"{'='*70}\n")
 
 
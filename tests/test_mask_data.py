@@ -0,0 +1,92 @@
+import copy
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from mask_data import mask_personal_data, mask_statement, unmask_response  # noqa: E402
+
+
+class MaskPersonalDataTest(unittest.TestCase):
+    def test_glued_thai_id_is_masked(self):
+        text = "1234567890123\nอ้างอิงบัตรประชาชน1234567890123"
+        masked, mapping = mask_personal_data(text)
+        self.assertNotIn("1234567890123", masked)
+        self.assertEqual(masked, "THAIID_001\nอ้างอิงบัตรประชาชนTHAIID_001")
+        self.assertEqual(mapping, {"THAIID_001": "1234567890123"})
+
+    def test_glued_account_number_is_masked(self):
+        text = "บัญชี 123-4-56789-0\nโอนเข้าบัญชีเลข123-4-56789-0"
+        masked, mapping = mask_personal_data(text)
+        self.assertNotIn("123-4-56789-0", masked)
+        self.assertEqual(mapping, {"ACCOUNT_001": "123-4-56789-0"})
+
+    def test_phone_inside_address_masks_its_glued_copy(self):
+        text = "99/1 ถนนสุขุมวิท โทร 0812345678\nติดต่อ0812345678"
+        masked, mapping = mask_personal_data(text)
+        self.assertEqual(masked, "ADDRESS_002\nติดต่อPHONE_001")
+        self.assertEqual(mapping, {
+            "PHONE_001": "0812345678",
+            "ADDRESS_002": "99/1 ถนนสุขุมวิท โทร 0812345678",
+        })
+
+    def test_thai_id_inside_address_masks_its_glued_copy(self):
+        text = "99/1 หมู่ 2 บัตร 1234567890123\nเลขที่บัตร1234567890123"
+        masked, mapping = mask_personal_data(text)
+        self.assertEqual(masked, "ADDRESS_002\nเลขที่บัตรTHAIID_001")
+        self.assertEqual(mapping["THAIID_001"], "1234567890123")
+
+    def test_name_across_blank_lines_is_masked_through_mask_statement(self):
+        data = {"pages": [{"page_number": 1, "text": "นาย สมชาย\n \n \nใจดี"}]}
+        masked, mapping = mask_statement(data)
+        self.assertEqual(masked["pages"][0]["text"], "NAME_001")
+        self.assertEqual(mapping, {"NAME_001": "นาย สมชาย\n \n \nใจดี"})
+
+    def test_glued_copy_is_masked_through_mask_statement(self):
+        data = {"pages": [{"page_number": 1,
+                           "text": "1234567890123\nอ้างอิงบัตรประชาชน1234567890123"}]}
+        masked, mapping = mask_statement(data)
+        self.assertEqual(masked["pages"][0]["text"],
+                         "THAIID_001\nอ้างอิงบัตรประชาชนTHAIID_001")
+        self.assertEqual(mapping, {"THAIID_001": "1234567890123"})
+
+
+
+class MaskStatementTest(unittest.TestCase):
+    def test_pages_share_tokens_without_cascading_renames(self):
+        data = {"pages": [
+            {"page_number": 1, "text": "นาย สมชาย ใจดี"},
+            # page-local NAME_001 is new, NAME_002 is the page 1 name:
+            # the renames NAME_001 -> NAME_002 and NAME_002 -> NAME_001 swap
+            {"page_number": 2, "text": "นาย สมศรี มีสุข\nนาย สมชาย ใจดี\nโทร 0812345678"},
+        ]}
+        original = copy.deepcopy(data)
+
+        masked, mapping = mask_statement(data)
+
+        self.assertEqual(mapping, {
+            "NAME_001": "นาย สมชาย ใจดี",
+            "NAME_002": "นาย สมศรี มีสุข",
+            "PHONE_003": "0812345678",
+        })
+        self.assertEqual(masked["pages"][0]["text"], "NAME_001")
+        self.assertEqual(masked["pages"][1]["text"], "NAME_002\nNAME_001\nโทร PHONE_003")
+        self.assertEqual(masked["pages"][1]["page_number"], 2)
+        self.assertEqual(data, original)
+
+
+class UnmaskResponseTest(unittest.TestCase):
+    def test_longer_token_is_not_split_by_shorter_prefix(self):
+        mapping = {"NAME_100": "นาย สมชาย ใจดี", "NAME_1000": "นาง สมศรี มีสุข"}
+        with tempfile.TemporaryDirectory() as tmp:
+            mapping_file = Path(tmp) / "statement_masked_mapping.json"
+            mapping_file.write_text(json.dumps(mapping, ensure_ascii=False), encoding="utf-8")
+            result = unmask_response("NAME_1000 และ NAME_100", str(mapping_file))
+        self.assertEqual(result, "นาง สมศรี มีสุข และ นาย สมชาย ใจดี")
+
+
+if __name__ == "__main__":
+    unittest.main()